@@ -1,178 +1,478 @@
 import os
+import sys
 import time
 import asyncio
-from datetime import datetime
+import heapq
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
 import gspread
+from gspread.utils import fill_gaps
 from google.oauth2.service_account import Credentials
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter, Retry
 import telegram
-from dotenv import load_dotenv
-from flask import Flask
-import threading
-import pytz
+from telegram.error import RetryAfter
+from telegram.request import HTTPXRequest
 import json  # Import the json library
+import logging
 
-# --- Flask Web Server Setup ---
-app = Flask(__name__)
+# --- Web Server Setup ---
+async def start_web_server():
+    """Serves the health check endpoint on the running event loop, alongside the notification loop."""
+    # Imported here so `--tick` runs, which never start the server, don't load the web stack
+    from aiohttp import web
 
+    async def home(request):
+        return web.Response(text="Notification service is running.")
 
-@app.route('/')
-def home():
-    return "Notification service is running."
-
-
-def run_flask_app():
-    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
+    app = web.Application()
+    app.router.add_get('/', home)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
+    await site.start()
+    return runner
 
 
 # --- Notification Logic ---
-load_dotenv()
+# Only local development uses a .env file; on Render the variables come from the environment
+if os.path.exists(".env"):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+# Logging (set LOG_LEVEL=DEBUG to see every wake-up and sent message)
+logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+if not isinstance(logging.getLevelName(LOG_LEVEL), int):
+    logger.warning("⚠️ Unknown LOG_LEVEL '%s'. Falling back to INFO.", LOG_LEVEL)
+    LOG_LEVEL = "INFO"
+logger.setLevel(LOG_LEVEL)
 
 # Configuration
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
 GOOGLE_SHEET_KEY = os.environ.get("GOOGLE_SHEET_KEY")
 TIMEZONE = os.environ.get("TIMEZONE", "Europe/London")
+TZ = ZoneInfo(TIMEZONE)
 # Get the credentials from the environment variable if it exists
 GOOGLE_CREDENTIALS_JSON = os.environ.get("GOOGLE_CREDENTIALS_JSON")
 CREDENTIALS_FILE = "credentials.json"  # Fallback for local development
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive.file",
+          "https://www.googleapis.com/auth/drive.metadata.readonly"]
+GOOGLE_API_TIMEOUT = (5, 5)  # (connect, read) seconds
+SHEETS_MAX_ATTEMPTS = 5  # Attempts per Sheets API call when rate limited (HTTP 429)
+# Upper bound on how long a cached schedule is trusted, even if the sheet reports no changes
+try:
+    SCHEDULE_TTL_SECONDS = int(os.environ.get("SCHEDULE_TTL_SECONDS", 6 * 60 * 60))
+except ValueError:
+    logger.warning("⚠️ Invalid SCHEDULE_TTL_SECONDS '%s'. Falling back to 6 hours.",
+                   os.environ.get("SCHEDULE_TTL_SECONDS"))
+    SCHEDULE_TTL_SECONDS = 6 * 60 * 60
+TELEGRAM_CONNECTION_POOL_SIZE = 8
+# Seconds between messages to the chat. Telegram allows about 1 message per second in a single chat;
+# for a group chat (20 messages per minute) set TELEGRAM_SEND_INTERVAL_SECONDS=3.
+try:
+    TELEGRAM_SEND_INTERVAL = float(os.environ.get("TELEGRAM_SEND_INTERVAL_SECONDS", 1))
+except ValueError:
+    logger.warning("⚠️ Invalid TELEGRAM_SEND_INTERVAL_SECONDS '%s'. Falling back to 1 second.",
+                   os.environ.get("TELEGRAM_SEND_INTERVAL_SECONDS"))
+    TELEGRAM_SEND_INTERVAL = 1.0
+TELEGRAM_MAX_SEND_ATTEMPTS = 3  # Attempts per message when Telegram asks us to slow down
+
+# (sheet key, date) -> (modified time, fetched at, timed tasks, flexible tasks)
+_schedule_cache = {}
+
+# Service account credentials, parsed once and reused by every client that gets built
+_credentials = None
+
+# Spaces out sends so bursts of tasks stay under the chat's rate limit
+_send_lock = asyncio.Lock()
+_last_send_time = 0.0
 
 
 def check_env_variables():
     # Only check for the main variables, as credentials can be handled in two ways
     if not all([TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, GOOGLE_SHEET_KEY]):
-        print("❌ FATAL ERROR: One or more environment variables are not set.", flush=True)
+        logger.error("❌ FATAL ERROR: One or more environment variables are not set.")
         return False
     return True
 
 
-def setup_google_sheets_client():
-    """Authenticates with Google Sheets using credentials from an environment variable or a local file."""
-    try:
-        SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive.file"]
+def get_credentials():
+    """Loads the service account credentials on first use and returns the cached copy afterwards.
 
+    The session built on top of them refreshes the access token as needed, so the key itself
+    never has to be parsed again.
+    """
+    global _credentials
+    if _credentials is None:
         # Prioritize environment variable (for Heroku/Render)
         if GOOGLE_CREDENTIALS_JSON:
-            print("Found GOOGLE_CREDENTIALS_JSON. Authenticating from environment variable.", flush=True)
+            logger.info("Found GOOGLE_CREDENTIALS_JSON. Authenticating from environment variable.")
             creds_json = json.loads(GOOGLE_CREDENTIALS_JSON)
-            creds = Credentials.from_service_account_info(creds_json, scopes=SCOPES)
+            _credentials = Credentials.from_service_account_info(creds_json, scopes=SCOPES)
         # Fallback to local file (for local testing)
         else:
-            print(f"GOOGLE_CREDENTIALS_JSON not found. Authenticating from local file: {CREDENTIALS_FILE}", flush=True)
-            creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
+            logger.info("GOOGLE_CREDENTIALS_JSON not found. Authenticating from local file: %s", CREDENTIALS_FILE)
+            _credentials = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
+    return _credentials
 
-        return gspread.authorize(creds)
+
+def setup_google_sheets_client():
+    """Authenticates with Google Sheets using credentials from an environment variable or a local file."""
+    try:
+        creds = get_credentials()
+
+        # Keep connections to the Google APIs alive between schedule refreshes
+        session = AuthorizedSession(creds)
+        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retries)
+        session.mount("https://", adapter)
+
+        client = gspread.Client(auth=creds, session=session)
+        client.set_timeout(GOOGLE_API_TIMEOUT)
+        return client
 
     except FileNotFoundError:
-        print(
-            f"❌ ERROR: Neither GOOGLE_CREDENTIALS_JSON environment variable nor '{CREDENTIALS_FILE}' file were found.",
-            flush=True)
+        logger.error(
+            "❌ ERROR: Neither GOOGLE_CREDENTIALS_JSON environment variable nor '%s' file were found.",
+            CREDENTIALS_FILE)
         return None
     except Exception as e:
-        print(f"❌ An error occurred during Google Sheets authentication: {e}", flush=True)
+        logger.error("❌ An error occurred during Google Sheets authentication: %s", e)
+        return None
+
+
+def call_with_backoff(func, *args, **kwargs):
+    """Calls a Sheets API function, retrying with capped exponential backoff and jitter when rate limited."""
+    for attempt in range(SHEETS_MAX_ATTEMPTS):
+        try:
+            return func(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            if e.response.status_code != 429 or attempt == SHEETS_MAX_ATTEMPTS - 1:
+                raise
+            delay = min(2 ** attempt + random.random(), 32)
+            logger.warning("⏳ Sheets API rate limit hit. Retrying in %.1fs...", delay)
+            time.sleep(delay)
+
+
+def parse_schedule_rows(all_data):
+    """Splits worksheet rows into timed tasks and flexible tasks."""
+    timed_schedule = []
+    flexible_tasks = []
+    parsing_flexible = False
+
+    for row in all_data:
+        # Check for the start of the flexible tasks section
+        if len(row) > 1 and "Flexible Tasks" in row[0]:
+            parsing_flexible = True
+            continue
+
+        if parsing_flexible:
+            if row and row[0]:  # Check if the row and the first cell are not empty
+                flexible_tasks.append(row[0])
+        else:  # Parsing timed tasks
+            if len(row) > 1 and row[0] and "Time" not in row[0] and "Schedule" not in row[0]:
+                time_str, activity = row[0], row[1]
+                if activity and activity != "---":
+                    try:
+                        time_of_day = datetime.strptime(time_str.strip(), "%I:%M %p").time()
+                    except ValueError:
+                        logger.warning("⚠️ Could not parse time '%s' for '%s'. Skipping.", time_str, activity)
+                        continue
+                    timed_schedule.append({
+                        "time": time_str,
+                        "activity": activity,
+                        "time_of_day": time_of_day,
+                    })
+
+    return timed_schedule, flexible_tasks
+
+
+def get_sheet_modified_time(client):
+    """Returns the Drive modifiedTime of the spreadsheet, or None if it can't be read.
+
+    Needs the Google Drive API enabled on the service account's GCP project; without it every
+    refresh falls back to a full fetch.
+    """
+    try:
+        metadata = call_with_backoff(client.http_client.get_file_drive_metadata, GOOGLE_SHEET_KEY)
+        return metadata["modifiedTime"]
+    except Exception as e:
+        logger.warning("⚠️ Could not read the sheet's modified time, fetching full schedule: %s", e)
         return None
 
 
 def get_todays_schedule(client):
-    """Fetches and parses today's schedule, returning both timed and flexible tasks."""
+    """Fetches and parses today's schedule, returning both timed and flexible tasks.
+
+    The parsed schedule is cached per day and only re-downloaded when the sheet's modified time
+    changes or the cached copy is older than SCHEDULE_TTL_SECONDS. Tomorrow's worksheet, if it
+    already exists, is fetched in the same request so the midnight refresh can come from the cache.
+
+    If the fetch fails, today's cached copy is returned when there is one; otherwise None, so the
+    caller can keep the schedule it already has instead of blanking it.
+    """
     if not client: return [], []
+    now = datetime.now(TZ)
+    today_str = now.strftime("%Y-%m-%d")
+    tomorrow_str = (now + timedelta(days=1)).strftime("%Y-%m-%d")
+    cache_key = (GOOGLE_SHEET_KEY, today_str)
     try:
-        tz = pytz.timezone(TIMEZONE)
-        today_str = datetime.now(tz).strftime("%Y-%m-%d")
-
-        spreadsheet = client.open_by_key(GOOGLE_SHEET_KEY)
-        worksheet = spreadsheet.worksheet(today_str)
-        all_data = worksheet.get_all_values()
-
-        timed_schedule = []
-        flexible_tasks = []
-        parsing_flexible = False
-
-        for row in all_data:
-            # Check for the start of the flexible tasks section
-            if len(row) > 1 and "Flexible Tasks" in row[0]:
-                parsing_flexible = True
-                continue
-
-            if parsing_flexible:
-                if row and row[0]:  # Check if the row and the first cell are not empty
-                    flexible_tasks.append(row[0])
-            else:  # Parsing timed tasks
-                if len(row) > 1 and row[0] and "Time" not in row[0] and "Schedule" not in row[0]:
-                    time_str, activity = row[0], row[1]
-                    if activity and activity != "---":
-                        timed_schedule.append({"time": time_str, "activity": activity})
-
-        print(f"✅ Successfully fetched schedule for today: {today_str}", flush=True)
-        print(f"   Found {len(timed_schedule)} timed tasks and {len(flexible_tasks)} flexible tasks.", flush=True)
+        # A single Drive call decides whether anything needs downloading at all
+        modified_time = get_sheet_modified_time(client)
+
+        cached = _schedule_cache.get(cache_key)
+        if cached and modified_time is not None:
+            cached_modified_time, fetched_at, timed_schedule, flexible_tasks = cached
+            if cached_modified_time == modified_time and time.monotonic() - fetched_at < SCHEDULE_TTL_SECONDS:
+                logger.info("✅ Schedule for %s unchanged since last fetch. Using cached copy.", today_str)
+                return timed_schedule, flexible_tasks
+
+        # A missing sheet would fail the whole batch request, so only ask for the days that exist
+        metadata = call_with_backoff(client.http_client.fetch_sheet_metadata, GOOGLE_SHEET_KEY,
+                                     params={"includeGridData": "false", "fields": "sheets.properties.title"})
+        titles = {sheet["properties"]["title"] for sheet in metadata.get("sheets", [])}
+        if today_str not in titles:
+            logger.warning("⚠️ No worksheet found for today (%s). Will try again later.", today_str)
+            return [], []
+        days = [day for day in (today_str, tomorrow_str) if day in titles]
+
+        # Timed and flexible tasks both live in columns A:B, so skip the rest of the sheet
+        response = call_with_backoff(client.http_client.values_batch_get, GOOGLE_SHEET_KEY,
+                                     [f"'{day}'!A:B" for day in days])
+        fetched_at = time.monotonic()
+
+        # Only today's and tomorrow's entries are ever needed, so drop previous days
+        _schedule_cache.clear()
+        parsed = {}
+        for day, value_range in zip(days, response["valueRanges"]):
+            # Padding keeps short rows two cells wide, matching what get_all_values() returned
+            parsed[day] = parse_schedule_rows(fill_gaps(value_range.get("values", []), cols=2))
+            # Stored even without a modified time, so it can still serve as a fallback if a later fetch fails
+            _schedule_cache[(GOOGLE_SHEET_KEY, day)] = (modified_time, fetched_at, *parsed[day])
+
+        timed_schedule, flexible_tasks = parsed[today_str]
+        logger.info("✅ Successfully fetched schedule for today: %s", today_str)
+        logger.info("   Found %d timed tasks and %d flexible tasks.", len(timed_schedule), len(flexible_tasks))
+        if tomorrow_str in parsed:
+            logger.info("   Prefetched tomorrow's schedule (%s) in the same request.", tomorrow_str)
         return timed_schedule, flexible_tasks
 
-    except gspread.exceptions.WorksheetNotFound:
-        print(f"⚠️ No worksheet found for today ({today_str}). Will try again later.", flush=True)
-        return [], []
     except Exception as e:
-        print(f"❌ An error occurred fetching the schedule: {e}", flush=True)
-        return [], []
+        logger.error("❌ An error occurred fetching the schedule: %s", e)
+        cached = _schedule_cache.get(cache_key)
+        if cached:
+            logger.warning("⚠️ Using the last fetched schedule for %s instead.", today_str)
+            return cached[2], cached[3]
+        return None
+
+
+async def wait_for_send_slot():
+    """Waits until at least TELEGRAM_SEND_INTERVAL has passed since the previous send."""
+    global _last_send_time
+    async with _send_lock:
+        delay = _last_send_time + TELEGRAM_SEND_INTERVAL - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        _last_send_time = time.monotonic()
 
 
 async def send_telegram_notification(bot, message):
-    try:
-        await bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
-        print(f"🚀 Notification sent: {message}", flush=True)
-    except Exception as e:
-        print(f"❌ Failed to send Telegram notification: {e}", flush=True)
+    for attempt in range(TELEGRAM_MAX_SEND_ATTEMPTS):
+        try:
+            await wait_for_send_slot()
+            await bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
+            logger.debug("🚀 Notification sent: %s", message)
+            return
+        except RetryAfter as e:
+            if attempt == TELEGRAM_MAX_SEND_ATTEMPTS - 1:
+                logger.error("❌ Failed to send Telegram notification, still rate limited: %s", message)
+                return
+            retry_after = e.retry_after
+            delay = retry_after.total_seconds() if isinstance(retry_after, timedelta) else retry_after
+            logger.warning("⏳ Telegram rate limit hit. Resending in %.0fs...", delay)
+            await asyncio.sleep(delay)
+        except Exception as e:
+            logger.error("❌ Failed to send Telegram notification: %s", e)
+            return
+
+
+async def send_all(bot, messages):
+    """Sends messages one after another, so they arrive in order (summary first, then reminders in sheet order).
+
+    Everything goes to the same chat, whose rate limit paces the sends anyway, so sending in parallel
+    would only risk reordering them.
+    """
+    for message in messages:
+        await send_telegram_notification(bot, message)
+
+
+def create_telegram_request():
+    # One persistent connection pool to api.telegram.org, reused for every notification
+    return HTTPXRequest(connection_pool_size=TELEGRAM_CONNECTION_POOL_SIZE, connect_timeout=5, read_timeout=10)
+
+
+def create_bot(request):
+    return telegram.Bot(token=TELEGRAM_BOT_TOKEN, request=request)
+
+
+def format_flexible_summary(flexible_tasks):
+    return " hourly flexible task reminder:\n" + "\n".join(f"  - {task}" for task in flexible_tasks)
+
+
+def format_task_reminder(task):
+    return f"🔔 Reminder: It's time for '{task['activity']}'"
+
+
+def build_task_heap(schedule, now):
+    """Groups tasks by time of day and returns a heap of (fire_timestamp, time_of_day, tasks) for the rest of today."""
+    by_time = defaultdict(list)
+    for task in schedule:
+        by_time[task['time_of_day']].append(task)
+
+    minute_start = now.replace(second=0, microsecond=0).timestamp()
+    heap = []
+    for time_of_day, tasks in by_time.items():
+        fire_ts = datetime.combine(now.date(), time_of_day, tzinfo=TZ).timestamp()
+        # Keep tasks due in the current minute so a refresh right on the minute doesn't drop them
+        if fire_ts >= minute_start:
+            heap.append((fire_ts, time_of_day, tasks))
+    heapq.heapify(heap)
+    return heap
+
+
+def next_hour_boundary(now):
+    """Returns the epoch timestamp of the next top of the hour.
+
+    Works in real seconds rather than wall-clock time, so the repeated hour when clocks go back
+    still gets its own refresh.
+    """
+    return now.replace(minute=0, second=0, microsecond=0).timestamp() + 60 * 60
+
+
+def hour_started_since(last_check, now):
+    """True once the top of an hour has passed since `last_check`.
+
+    The one rule for when the schedule is refreshed and the flexible task summary is sent.
+    """
+    return now.timestamp() >= next_hour_boundary(last_check)
+
+
+def collect_due_messages(task_heap, notified_slots, now, flexible_tasks, summary_due):
+    """Pops every time slot due by `now` off the heap and returns the messages to send.
+
+    Both the long-running loop and `--tick` runs decide what to send here, so they can't drift apart.
+    """
+    messages = []
+    # Send a summary of flexible tasks every hour
+    if summary_due and flexible_tasks:
+        messages.append(format_flexible_summary(flexible_tasks))
+
+    while task_heap and task_heap[0][0] <= now.timestamp():
+        _, time_of_day, tasks = heapq.heappop(task_heap)
+        slot = (now.toordinal(), time_of_day.hour * 60 + time_of_day.minute)
+        if slot in notified_slots:
+            continue
+        messages.extend(format_task_reminder(task) for task in tasks)
+        notified_slots.add(slot)
+    return messages
 
 
 async def notification_loop():
     if not check_env_variables(): return
 
-    print(f"--- Starting Notification Service in timezone: {TIMEZONE} ---", flush=True)
+    logger.info("--- Starting Notification Service in timezone: %s ---", TIMEZONE)
 
-    bot = telegram.Bot(token=TELEGRAM_BOT_TOKEN)
+    bot = create_bot(create_telegram_request())
     gspread_client = setup_google_sheets_client()
 
-    schedule, _ = get_todays_schedule(gspread_client)  # Ignore flexible tasks on initial fetch
-    last_hour_checked = datetime.now(pytz.timezone(TIMEZONE)).hour
-    notified_tasks = set()
+    # Fetches run in a worker thread so backoff sleeps don't block the event loop.
+    # Flexible tasks from the initial fetch are only sent at the next hourly refresh.
+    schedule, flexible_tasks = await asyncio.to_thread(get_todays_schedule, gspread_client) or ([], [])
+    current_time = datetime.now(TZ)
+    task_heap = build_task_heap(schedule, current_time)
+    last_refresh = current_time
+    notified_slots = set()  # (date ordinal, minute of day) of time slots already notified
 
     while True:
-        tz = pytz.timezone(TIMEZONE)
-        current_time = datetime.now(tz)
+        current_time = datetime.now(TZ)
+        summary_due = hour_started_since(last_refresh, current_time)
 
-        if current_time.hour != last_hour_checked:
-            print(f"\n🔄 New hour detected! Refreshing schedule...", flush=True)
-            schedule, flexible_tasks = get_todays_schedule(gspread_client)
-            last_hour_checked = current_time.hour
-            notified_tasks.clear()
+        if summary_due:
+            logger.info("🔄 New hour detected! Refreshing schedule...")
+            fetched = await asyncio.to_thread(get_todays_schedule, gspread_client)
+            if fetched is None:
+                # Keep the current heap rather than dropping the rest of the hour's reminders
+                logger.warning("⚠️ Schedule refresh failed. Keeping the previous schedule.")
+            else:
+                schedule, flexible_tasks = fetched
+                task_heap = build_task_heap(schedule, current_time)
+            last_refresh = current_time
+            # Keep today's entries so a refresh within a minute that already fired doesn't notify it twice
+            today = current_time.toordinal()
+            notified_slots = {slot for slot in notified_slots if slot[0] == today}
 
-            # ** THE FIX IS HERE **
-            # Send a summary of flexible tasks every hour
-            if flexible_tasks:
-                message_parts = [" hourly flexible task reminder:"]
-                for task in flexible_tasks:
-                    message_parts.append(f"  - {task}")
-                flexible_task_summary = "\n".join(message_parts)
-                await send_telegram_notification(bot, flexible_task_summary)
+        await send_all(bot, collect_due_messages(task_heap, notified_slots, current_time, flexible_tasks, summary_due))
 
-        current_time_str_12hr = current_time.strftime("%I:%M %p").upper()
+        # Sleep until whichever comes first: the next task or the next hourly refresh
+        next_event_ts = next_hour_boundary(last_refresh)
+        if task_heap:
+            next_event_ts = min(next_event_ts, task_heap[0][0])
+        delay = max(0, next_event_ts - time.time())
 
-        print(
-            f"[{current_time.strftime('%Y-%m-%d %H:%M:%S %Z')}] Checking for tasks. Current time: {current_time_str_12hr}",
-            flush=True)
+        logger.debug("Checked tasks at %s: %d task times pending. Sleeping %.0fs until next event.",
+                     current_time, len(task_heap), delay)
 
-        for task in schedule:
-            task_key = f"{task['time']}-{task['activity']}"
-            if task['time'].upper() == current_time_str_12hr and task_key not in notified_tasks:
-                message = f"🔔 Reminder: It's time for '{task['activity']}'"
-                await send_telegram_notification(bot, message)
-                notified_tasks.add(task_key)
+        await asyncio.sleep(delay)
 
-        await asyncio.sleep(60)
 
+async def check_and_notify(bot, gspread_client, now):
+    """Sends the reminders due in the minute of `now`, plus the flexible task summary on the hour.
+
+    This is a single stateless check, meant to be run once a minute by a cron job instead of keeping
+    notification_loop alive. Each run only covers its own minute: if the scheduler skips a run
+    entirely, that minute's reminders are not sent (a run that merely starts a few seconds late is fine).
+    """
+    schedule, flexible_tasks = await asyncio.to_thread(get_todays_schedule, gspread_client) or ([], [])
+
+    # Treat the run as the loop waking up one minute after the previous run
+    minute_start = now.replace(second=0, microsecond=0)
+    previous_run = datetime.fromtimestamp(minute_start.timestamp() - 60, TZ)
+    summary_due = hour_started_since(previous_run, now)
+
+    messages = collect_due_messages(build_task_heap(schedule, now), set(), now, flexible_tasks, summary_due)
+    logger.info("Checked tasks at %s: %d notification(s) due.", now.strftime("%Y-%m-%d %H:%M %Z"), len(messages))
+    await send_all(bot, messages)
+
+
+async def run_tick():
+    if not check_env_variables(): return
+    # Read the clock before any network calls so a slow fetch can't push us into the next minute
+    now = datetime.now(TZ)
+    # Closes the connection pool before the process exits. The bot itself is never initialized,
+    # so a tick doesn't spend a getMe round trip (or fail on one) before sending anything.
+    async with create_telegram_request() as request:
+        await check_and_notify(create_bot(request), setup_google_sheets_client(), now)
 
-if __name__ == "__main__":
-    flask_thread = threading.Thread(target=run_flask_app, daemon=True)
-    flask_thread.start()
-    print("🚀 Flask web server started in a background thread.", flush=True)
 
-    print("--- Preparing to start notification loop... ---", flush=True)
-    asyncio.run(notification_loop())
+async def main():
+    runner = await start_web_server()
+    logger.info("🚀 Web server started on the event loop.")
+
+    try:
+        logger.info("--- Preparing to start notification loop... ---")
+        await notification_loop()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    # `python main.py --tick` runs one check and exits, for use from a once-a-minute cron job
+    if "--tick" in sys.argv[1:]:
+        asyncio.run(run_tick())
+    else:
+        asyncio.run(main())